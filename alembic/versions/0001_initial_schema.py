@@ -0,0 +1,108 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15
+
+Bancos criados pelo antigo `create_all` já têm este schema: as tabelas
+existentes são puladas, e o banco é adotado sem `alembic stamp` manual
+(o container roda `alembic upgrade head` em todo start).
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_tables() -> set[str]:
+    if context.is_offline_mode():
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    existing = _existing_tables()
+
+    if "sync_runs" not in existing:
+        _create_sync_runs()
+    if "external_mappings" not in existing:
+        _create_external_mappings()
+    if "idempotency_keys" not in existing:
+        _create_idempotency_keys()
+    if "raw_store" not in existing:
+        _create_raw_store()
+
+
+def _create_sync_runs() -> None:
+    op.create_table(
+        "sync_runs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("table_name", sa.String(length=10), nullable=False),
+        sa.Column("mode", sa.String(length=30), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("details", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True),
+                  server_default=sa.text("CURRENT_TIMESTAMP"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_sync_runs_table_name", "sync_runs", ["table_name"])
+
+
+def _create_external_mappings() -> None:
+    op.create_table(
+        "external_mappings",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("entity_type", sa.String(length=20), nullable=False),
+        sa.Column("source_id", sa.String(length=60), nullable=False),
+        sa.Column("protheus_code", sa.String(length=60), nullable=False),
+        sa.Column("protheus_store", sa.String(length=10), nullable=False),
+        sa.Column("extra", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True),
+                  server_default=sa.text("CURRENT_TIMESTAMP"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("entity_type", "source_id", name="uq_entity_source"),
+    )
+    op.create_index("ix_external_mappings_entity_type", "external_mappings", ["entity_type"])
+    op.create_index("ix_external_mappings_source_id", "external_mappings", ["source_id"])
+
+
+def _create_idempotency_keys() -> None:
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("key", sa.String(length=120), nullable=False),
+        sa.Column("endpoint", sa.String(length=80), nullable=False),
+        sa.Column("response_json", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True),
+                  server_default=sa.text("CURRENT_TIMESTAMP"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("key", "endpoint", name="uq_key_endpoint"),
+    )
+    op.create_index("ix_idempotency_keys_key", "idempotency_keys", ["key"])
+    op.create_index("ix_idempotency_keys_endpoint", "idempotency_keys", ["endpoint"])
+
+
+def _create_raw_store() -> None:
+    op.create_table(
+        "raw_store",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("table_name", sa.String(length=10), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True),
+                  server_default=sa.text("CURRENT_TIMESTAMP"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_raw_store_table_name", "raw_store", ["table_name"])
+
+
+def downgrade() -> None:
+    op.drop_table("raw_store")
+    op.drop_table("idempotency_keys")
+    op.drop_table("external_mappings")
+    op.drop_table("sync_runs")
@@ -0,0 +1,29 @@
+"""idempotency lookup served by uq_key_endpoint only
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15
+
+get_idem/find_idem filtram por (key, endpoint), que é exatamente o índice
+único uq_key_endpoint. Os índices avulsos em key (prefixo do composto) e em
+endpoint (baixa cardinalidade) só custavam escrita.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_idempotency_keys_key", table_name="idempotency_keys")
+    op.drop_index("ix_idempotency_keys_endpoint", table_name="idempotency_keys")
+
+
+def downgrade() -> None:
+    op.create_index("ix_idempotency_keys_endpoint", "idempotency_keys", ["endpoint"])
+    op.create_index("ix_idempotency_keys_key", "idempotency_keys", ["key"])
@@ -0,0 +1,35 @@
+"""raw_blobs: payloads crus comprimidos
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "raw_blobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("table_name", sa.String(length=10), nullable=False),
+        sa.Column("meta", sa.JSON(), nullable=False),
+        sa.Column("encoding", sa.String(length=10), nullable=False),
+        sa.Column("content", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True),
+                  server_default=sa.text("CURRENT_TIMESTAMP"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_raw_blobs_table_name", "raw_blobs", ["table_name"])
+
+
+def downgrade() -> None:
+    op.drop_table("raw_blobs")
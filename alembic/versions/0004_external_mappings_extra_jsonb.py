@@ -0,0 +1,30 @@
+"""external_mappings.extra como JSONB no PostgreSQL
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-15
+
+O UPSERT de mapeamento mescla `extra` com `||` no banco; com JSONB não há
+cast por linha. Em SQLite nada muda (JSON continua TEXT + json_patch).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE external_mappings ALTER COLUMN extra TYPE JSONB USING extra::jsonb")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE external_mappings ALTER COLUMN extra TYPE JSON USING extra::json")
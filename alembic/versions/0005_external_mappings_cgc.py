@@ -0,0 +1,60 @@
+"""external_mappings.cgc como coluna própria
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-15
+
+O CGC do cliente saía de extra->>'CGC'. Agora é coluna indexada; o backfill
+copia o valor de extra e o remove de lá.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("external_mappings") as batch_op:
+        batch_op.add_column(sa.Column("cgc", sa.String(length=20), nullable=False, server_default=""))
+        batch_op.create_index("ix_external_mappings_cgc", ["cgc"])
+
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "UPDATE external_mappings "
+            "SET cgc = COALESCE(extra->>'CGC', ''), extra = extra - 'CGC' "
+            "WHERE extra ? 'CGC'"
+        )
+    else:
+        op.execute(
+            "UPDATE external_mappings "
+            "SET cgc = COALESCE(json_extract(extra, '$.CGC'), ''), extra = json_remove(extra, '$.CGC') "
+            "WHERE json_type(extra, '$.CGC') IS NOT NULL"
+        )
+
+    with op.batch_alter_table("external_mappings") as batch_op:
+        batch_op.alter_column("cgc", server_default=None)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "UPDATE external_mappings "
+            "SET extra = extra || jsonb_build_object('CGC', cgc) "
+            "WHERE entity_type = 'customer'"
+        )
+    else:
+        op.execute(
+            "UPDATE external_mappings "
+            "SET extra = json_set(extra, '$.CGC', cgc) "
+            "WHERE entity_type = 'customer'"
+        )
+
+    with op.batch_alter_table("external_mappings") as batch_op:
+        batch_op.drop_index("ix_external_mappings_cgc")
+        batch_op.drop_column("cgc")
@@ -1,18 +1,124 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import orjson
+from sqlalchemy import create_engine, event, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import StaticPool
 
 
 class Base(DeclarativeBase):
     pass
 
 
-def get_engine(database_url: str):
-    connect_args = {}
-    # SQLite thread setting (FastAPI)
-    if database_url.startswith("sqlite"):
+def _json_dumps(obj) -> str:
+    return orjson.dumps(obj).decode()
+
+
+# colunas JSON (payloads/extra) serializadas com orjson em vez do json da stdlib
+_JSON_OPTS = {"json_serializer": _json_dumps, "json_deserializer": orjson.loads}
+
+
+# Bancos com INSERT ... ON CONFLICT (ver dialect_insert)
+SUPPORTED_BACKENDS = ("sqlite", "postgresql")
+
+
+def get_engine(
+    database_url: str,
+    *,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_recycle_s: int = 1800,
+):
+    url = make_url(database_url)
+
+    # Falha na subida, não no meio de um POST já aceito pelo Protheus
+    # (sem mapeamento nem chave de idempotência, o retry duplicaria o registro).
+    if url.get_backend_name() not in SUPPORTED_BACKENDS:
+        raise ValueError(
+            f"DATABASE_URL não suportada: {url.get_backend_name()} "
+            f"(use {' ou '.join(SUPPORTED_BACKENDS)}).")
+
+    if url.get_backend_name() == "sqlite":
+        # SQLite thread setting (FastAPI)
         connect_args = {"check_same_thread": False}
-    return create_engine(database_url, echo=False, future=True, connect_args=connect_args)
+        if url.database in (None, "", ":memory:"):
+            # banco em memória só existe dentro de uma conexão: compartilha uma só
+            return create_engine(database_url, echo=False, future=True,
+                                 connect_args=connect_args, poolclass=StaticPool,
+                                 **_JSON_OPTS)
+        engine = create_engine(
+            database_url,
+            echo=False,
+            future=True,
+            connect_args=connect_args,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=True,
+            **_JSON_OPTS,
+        )
+        event.listen(engine, "connect", _sqlite_pragmas)
+        return engine
+
+    return create_engine(
+        database_url,
+        echo=False,
+        future=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=True,
+        pool_recycle=pool_recycle_s,
+        pool_use_lifo=True,
+        **_JSON_OPTS,
+    )
+
+
+def _sqlite_pragmas(dbapi_conn, _record):
+    # WAL: leitores não bloqueiam o escritor; NORMAL: sem fsync a cada commit
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.close()
 
 
 def get_session_factory(engine):
-    return sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    # expire_on_commit=False: objetos devolvidos após o commit não disparam
+    # um SELECT de refresh a cada atributo lido
+    return sessionmaker(bind=engine, autoflush=False, autocommit=False,
+                        expire_on_commit=False, future=True)
+
+
+# --- Helpers por dialeto (UPSERT) ---------------------------------------------
+
+def dialect_insert(db: Session, table):
+    """
+    insert() do dialeto em uso, com suporte a on_conflict_do_update.
+    (PostgreSQL e SQLite têm a mesma API para ON CONFLICT.)
+    """
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert(table)
+    if name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"UPSERT não suportado para o banco: {name}")
+
+
+def json_merge(db: Session, current, new: dict):
+    """
+    Merge raso de objetos JSON feito no próprio banco: cada chave de 1º nível
+    de `new` substitui a de `current` (inclusive com null; objetos aninhados
+    são trocados, não mesclados).
+
+    PostgreSQL: || de JSONB (models.JSONDoc). SQLite: json_set chave a chave,
+    já que json_patch segue o RFC 7396 (null apaga a chave, mescla aninhados).
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return current.op("||")(literal(new, type_=postgresql.JSONB))
+
+    args = []
+    for key, value in new.items():
+        if '"' in key:
+            raise ValueError(f"Chave inválida para merge JSON: {key}")
+        args += [f'$."{key}"', func.json(_json_dumps(value))]
+    return func.json_set(current, *args) if args else current
@@ -6,20 +6,23 @@ API intermediária (FastAPI) para integrar com TOTVS Protheus via endpoints REST
 - POST /rest/WSSALESORDERS
 """
 
+from contextlib import asynccontextmanager
+
 import httpx
-from fastapi import Depends, FastAPI, HTTPException, Query
-from sqlalchemy.orm import Session
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 
-from .db import Base, get_engine, get_session_factory
+from .db import get_engine, get_session_factory
 from .protheus_client import ProtheusClient, ProtheusConfig
 from .schemas import CustomerBody, FilterRequest, PeriodRequest, PullRequest, SalesOrderBody
 from .security import require_api_key
 from .services import sync_service
 from .services.customer_service import get_idem, save_idem, upsert_mapping_customer
 from .services.order_service import (
-    apply_order_defaults,
-    build_idempotency_key,
     find_idem,
+    prepare_order,
     save_idem as save_idem_order,
     upsert_mapping_order,
 )
@@ -28,9 +31,13 @@ from .settings import settings
 
 # --- Infra (DB / Client) ------------------------------------------------------
 
-engine = get_engine(settings.DATABASE_URL)
+engine = get_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle_s=settings.DB_POOL_RECYCLE_S,
+)
 SessionLocal = get_session_factory(engine)
-Base.metadata.create_all(bind=engine)
 
 protheus = ProtheusClient(
     ProtheusConfig(
@@ -38,18 +45,30 @@ protheus = ProtheusClient(
         username=settings.PROTHEUS_USERNAME,
         password=settings.PROTHEUS_PASSWORD,
         timeout_s=settings.PROTHEUS_TIMEOUT_S,
+        max_connections=settings.PROTHEUS_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.PROTHEUS_MAX_KEEPALIVE,
+        keepalive_expiry_s=settings.PROTHEUS_KEEPALIVE_EXPIRY_S,
+        http2=settings.PROTHEUS_HTTP2,
+        connect_retries=settings.PROTHEUS_CONNECT_RETRIES,
+        proxy=settings.PROTHEUS_PROXY,
     )
 )
 
-app = FastAPI(title=settings.APP_NAME)
 
-
-def get_db():
-    db = SessionLocal()
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    protheus.open()
     try:
-        yield db
+        yield
     finally:
-        db.close()
+        await protheus.aclose()
+
+
+app = FastAPI(
+    title=settings.APP_NAME,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 # --- Util ---------------------------------------------------------------------
@@ -66,211 +85,222 @@ def _safe_first_aretusr(data):
         return None
 
 
+def _norm(value) -> str | None:
+    """Texto sem espaços nas pontas; None quando vazio."""
+    if value is None:
+        return None
+    s = (value if isinstance(value, str) else str(value)).strip()
+    return s or None
+
+
+def _pick(*values) -> str | None:
+    """Primeiro valor não vazio (já normalizado), ex.: A1_CPEDX ou A1_CGC."""
+    for value in values:
+        s = _norm(value)
+        if s:
+            return s
+    return None
+
+
+def _flag(value: str | None) -> bool:
+    """Parâmetros tipo cReset/cAltera: verdadeiro só para "S"."""
+    return value is not None and value.strip() in ("S", "s")
+
+
+def _in_session(fn, *args, **kwargs):
+    with SessionLocal() as db:
+        result = fn(db, *args, **kwargs)
+        db.commit()
+        return result
+
+
+async def _db(fn, *args, **kwargs):
+    """
+    Executa fn(db, *args, **kwargs) numa sessão própria, com commit no fim.
+    O SQLAlchemy aqui é síncrono: roda no threadpool para que uma consulta
+    lenta (ou um lock do SQLite) não trave o event loop e as outras rotas.
+    """
+    return await run_in_threadpool(_in_session, fn, *args, **kwargs)
+
+
+async def _log_error(table: str, mode: str, error: Exception) -> None:
+    await _db(sync_service.log_run, table, mode, "error", {"error": str(error)})
+
+
 # --- Endpoints básicos ---------------------------------------------------------
 
+# Respostas fixas: serializadas uma vez no import (o /health é chamado o tempo
+# todo por probes de liveness).
+_HEALTH_JSON = orjson.dumps({"status": "ok", "env": settings.APP_ENV})
+_META_JSON = orjson.dumps({
+    "wsgetpedx_tables": ["SA1", "SA3", "SA4", "SB1", "DA1", "SE4", "SC5", "SF2"],
+    "customers": {"create": "/rest/WSCUSTOMERS", "update": "/rest/WSCUSTOMERS?cAltera=S"},
+    "salesorders": {"create": "/rest/WSSALESORDERS"},
+})
+
+
 @app.get("/health")
-def health():
-    return {"status": "ok", "env": settings.APP_ENV}
+async def health():
+    return Response(content=_HEALTH_JSON, media_type="application/json")
 
 
 @app.get("/meta/protheus", dependencies=[Depends(require_api_key)])
-def meta_protheus():
-    return {
-        "wsgetpedx_tables": ["SA1", "SA3", "SA4", "SB1", "DA1", "SE4", "SC5", "SF2"],
-        "customers": {"create": "/rest/WSCUSTOMERS", "update": "/rest/WSCUSTOMERS?cAltera=S"},
-        "salesorders": {"create": "/rest/WSSALESORDERS"},
-    }
+async def meta_protheus():
+    return Response(content=_META_JSON, media_type="application/json")
 
 
 # --- Rotas internas (conveniência) --------------------------------------------
+#
+# As rotas não recebem sessão via Depends: a chamada ao Protheus (lenta) acontece
+# sem conexão do pool presa, e a sessão só é aberta (via _db, no threadpool)
+# para gravar o resultado.
 
 @app.post("/sync/reset/{table}", dependencies=[Depends(require_api_key)])
-def sync_reset(table: str, db: Session = Depends(get_db)):
+async def sync_reset(table: str):
     try:
         t = sync_service.ensure_table(table)
-        data = protheus.get_wsgetpedx(t, reset=True)
+        data = await protheus.get_wsgetpedx(t, reset=True)
+
+        def _save(db):
+            if settings.STORE_RAW:
+                sync_service.store_raw(db, t, {"reset_response": data})
+            sync_service.log_run(db, t, "reset", "success", sync_service.summarize(data))
 
-        sync_service.store_raw(db, t, {"reset_response": data})
-        sync_service.log_run(db, t, "reset", "success", {"response": data})
+        await _db(_save)
         return data
 
     except ValueError as e:
-        sync_service.log_run(db, (table or "").upper(),
-                             "reset", "error", {"error": str(e)})
+        await _log_error((table or "").upper(), "reset", e)
         raise HTTPException(status_code=400, detail=str(e)) from e
 
     except httpx.HTTPError as e:
-        sync_service.log_run(db, (table or "").upper(),
-                             "reset", "error", {"error": str(e)})
+        await _log_error((table or "").upper(), "reset", e)
         raise HTTPException(status_code=502, detail=str(e)) from e
 
 
 @app.post("/sync/pull", dependencies=[Depends(require_api_key)])
-def sync_pull(req: PullRequest, db: Session = Depends(get_db)):
+async def sync_pull(req: PullRequest):
+    """Tabela inteira (SB1, SA1...): repassa o JSON cru sem decodificar."""
     try:
         t = sync_service.ensure_table(req.table)
-        data = protheus.get_wsgetpedx(t, reset=req.reset)
-
-        sync_service.store_raw(db, t, {"pull_response": data})
-        sync_service.log_run(db, t, "pull", "success", {"reset": req.reset})
-        return data
+        raw = await protheus.get_wsgetpedx_raw(t, reset=req.reset)
+        return await _forward_raw(t, "pull", raw, meta={"pull": {"reset": req.reset}},
+                                  details={"reset": req.reset})
 
     except ValueError as e:
-        sync_service.log_run(db, (req.table or "").upper(),
-                             "pull", "error", {"error": str(e)})
+        await _log_error((req.table or "").upper(), "pull", e)
         raise HTTPException(status_code=400, detail=str(e)) from e
 
     except httpx.HTTPError as e:
-        sync_service.log_run(db, (req.table or "").upper(),
-                             "pull", "error", {"error": str(e)})
+        await _log_error((req.table or "").upper(), "pull", e)
         raise HTTPException(status_code=502, detail=str(e)) from e
 
 
 @app.post("/sync/pull/filter", dependencies=[Depends(require_api_key)])
-def sync_pull_filter(req: FilterRequest, db: Session = Depends(get_db)):
+async def sync_pull_filter(req: FilterRequest):
     try:
         t = sync_service.ensure_table(req.table)
-        if not req.campo.strip() or not req.valor.strip():
+        campo, valor = _norm(req.campo), _norm(req.valor)
+        if not campo or not valor:
             raise ValueError("campo/valor não podem ser vazios.")
 
-        data = protheus.get_wsgetpedx(
-            t, campo=req.campo.strip(), valor=req.valor.strip())
+        data = await protheus.get_wsgetpedx(t, campo=campo, valor=valor)
 
-        sync_service.store_raw(
-            db, t, {"filter": {"campo": req.campo, "valor": req.valor}, "response": data})
-        sync_service.log_run(db, t, "pull_filter", "success", {
-                             "campo": req.campo, "valor": req.valor})
+        def _save(db):
+            if settings.STORE_RAW:
+                sync_service.store_raw(
+                    db, t, {"filter": {"campo": req.campo, "valor": req.valor}, "response": data})
+            sync_service.log_run(db, t, "pull_filter", "success", {
+                                 "campo": req.campo, "valor": req.valor})
+
+        await _db(_save)
         return data
 
     except ValueError as e:
-        sync_service.log_run(db, (req.table or "").upper(),
-                             "pull_filter", "error", {"error": str(e)})
+        await _log_error((req.table or "").upper(), "pull_filter", e)
         raise HTTPException(status_code=400, detail=str(e)) from e
 
     except httpx.HTTPError as e:
-        sync_service.log_run(db, (req.table or "").upper(),
-                             "pull_filter", "error", {"error": str(e)})
+        await _log_error((req.table or "").upper(), "pull_filter", e)
         raise HTTPException(status_code=502, detail=str(e)) from e
 
 
-@app.post("/sync/pull/orders", dependencies=[Depends(require_api_key)])
-def sync_orders(req: PeriodRequest, db: Session = Depends(get_db)):
-    try:
-        dt_de, dt_ate = sync_service.validate_period(req.dtDe, req.dtAte)
-        data = protheus.get_wsgetpedx("SC5", dt_de=dt_de, dt_ate=dt_ate)
-
-        sync_service.store_raw(
-            db, "SC5", {"period": {"dtDe": dt_de, "dtAte": dt_ate}, "response": data})
-        sync_service.log_run(db, "SC5", "orders", "success", {
-                             "dtDe": dt_de, "dtAte": dt_ate})
-        return data
+async def _forward_raw(table: str, mode: str, raw: bytes, *, meta: dict, details: dict) -> Response:
+    """
+    Dumps grandes: o corpo do Protheus volta ao cliente como veio, sem montar
+    a lista de dicts em memória (nem reserializar). Se STORE_RAW, guarda
+    comprimido em raw_blobs.
+    """
+    blob = None
+    if settings.STORE_RAW:
+        blob = await run_in_threadpool(sync_service.compress_raw, raw)
 
-    except ValueError as e:
-        sync_service.log_run(db, "SC5", "orders", "error", {"error": str(e)})
-        raise HTTPException(status_code=400, detail=str(e)) from e
+    def _save(db):
+        if blob is not None:
+            sync_service.store_raw_blob(db, table, meta, blob)
+        sync_service.log_run(db, table, mode, "success", details)
 
-    except httpx.HTTPError as e:
-        sync_service.log_run(db, "SC5", "orders", "error", {"error": str(e)})
-        raise HTTPException(status_code=502, detail=str(e)) from e
+    await _db(_save)
+    return Response(content=raw, media_type="application/json")
 
 
-@app.post("/sync/pull/invoices", dependencies=[Depends(require_api_key)])
-def sync_invoices(req: PeriodRequest, db: Session = Depends(get_db)):
+async def _sync_period(table: str, mode: str, req: PeriodRequest) -> Response:
+    """SC5/SF2 por período: repassa o JSON cru (dumps grandes) sem decodificar."""
     try:
         dt_de, dt_ate = sync_service.validate_period(req.dtDe, req.dtAte)
-        data = protheus.get_wsgetpedx("SF2", dt_de=dt_de, dt_ate=dt_ate)
-
-        sync_service.store_raw(
-            db, "SF2", {"period": {"dtDe": dt_de, "dtAte": dt_ate}, "response": data})
-        sync_service.log_run(db, "SF2", "invoices", "success", {
-                             "dtDe": dt_de, "dtAte": dt_ate})
-        return data
+        raw = await protheus.get_wsgetpedx_raw(table, dt_de=dt_de, dt_ate=dt_ate)
+        return await _forward_raw(table, mode, raw,
+                                  meta={"period": {"dtDe": dt_de, "dtAte": dt_ate}},
+                                  details={"dtDe": dt_de, "dtAte": dt_ate})
 
     except ValueError as e:
-        sync_service.log_run(db, "SF2", "invoices", "error", {"error": str(e)})
+        await _log_error(table, mode, e)
         raise HTTPException(status_code=400, detail=str(e)) from e
 
     except httpx.HTTPError as e:
-        sync_service.log_run(db, "SF2", "invoices", "error", {"error": str(e)})
+        await _log_error(table, mode, e)
         raise HTTPException(status_code=502, detail=str(e)) from e
 
 
-@app.post("/customers", dependencies=[Depends(require_api_key)])
-def create_customer(body: CustomerBody, db: Session = Depends(get_db)):
-    """
-    POST /rest/WSCUSTOMERS
-    Idempotência: A1_CPEDX (preferência) ou A1_CGC.
-    """
-    try:
-        if not body.CLIENTES:
-            raise ValueError("CLIENTES vazio.")
-
-        c = body.CLIENTES[0]
-        idem_key = str(c.get("A1_CPEDX") or c.get("A1_CGC") or "").strip()
-        if not idem_key:
-            raise ValueError("Cliente sem chave (faltou A1_CPEDX ou A1_CGC).")
-
-        endpoint = "POST:/customers"
-        existing = get_idem(db, idem_key, endpoint)
-        if existing:
-            return {"idempotent": True, "cached_response": existing.response_json}
-
-        data = protheus.post_customers(body.model_dump(), altera=False)
-
-        aRetUsr = _safe_first_aretusr(data)
-        if aRetUsr:
-            a1_cod = str(aRetUsr.get("A1_COD", "")).strip()
-            a1_loja = str(aRetUsr.get("A1_LOJA", "")).strip()
-            cgc = str(aRetUsr.get("CGC", "")).strip()
-            source_id = str(c.get("A1_CPEDX") or cgc).strip()
-
-            upsert_mapping_customer(
-                db,
-                source_id=source_id,
-                a1_cod=a1_cod,
-                a1_loja=a1_loja,
-                cgc=cgc,
-                extra={"Mensagem": aRetUsr.get("Mensagem", "")},
-            )
+@app.post("/sync/pull/orders", dependencies=[Depends(require_api_key)])
+async def sync_orders(req: PeriodRequest):
+    return await _sync_period("SC5", "orders", req)
 
-        save_idem(db, idem_key, endpoint, data)
-        return data
 
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e)) from e
+@app.post("/sync/pull/invoices", dependencies=[Depends(require_api_key)])
+async def sync_invoices(req: PeriodRequest):
+    return await _sync_period("SF2", "invoices", req)
 
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=502, detail=str(e)) from e
 
+# --- Clientes / Pedidos (lógica compartilhada pelas rotas) --------------------
 
-@app.put("/customers", dependencies=[Depends(require_api_key)])
-def update_customer(body: CustomerBody, db: Session = Depends(get_db)):
+async def _handle_customer(body: CustomerBody, *, altera: bool):
     """
-    POST /rest/WSCUSTOMERS?cAltera=S
-    Idempotência: A1_CPEDX (preferência) ou A1_CGC.
+    POST /rest/WSCUSTOMERS (altera=True -> ?cAltera=S)
+    Idempotência: A1_CPEDX (preferência) ou A1_CGC, separada por create/update.
     """
-    try:
-        if not body.CLIENTES:
-            raise ValueError("CLIENTES vazio.")
+    if not body.CLIENTES:
+        raise ValueError("CLIENTES vazio.")
 
-        c = body.CLIENTES[0]
-        idem_key = str(c.get("A1_CPEDX") or c.get("A1_CGC") or "").strip()
-        if not idem_key:
-            raise ValueError("Cliente sem chave (faltou A1_CPEDX ou A1_CGC).")
+    c = body.CLIENTES[0]
+    idem_key = _pick(c.get("A1_CPEDX"), c.get("A1_CGC"))
+    if not idem_key:
+        raise ValueError("Cliente sem chave (faltou A1_CPEDX ou A1_CGC).")
 
-        endpoint = "PUT:/customers"
-        existing = get_idem(db, idem_key, endpoint)
-        if existing:
-            return {"idempotent": True, "cached_response": existing.response_json}
+    endpoint = "PUT:/customers" if altera else "POST:/customers"
+    existing = await _db(get_idem, idem_key, endpoint)
+    if existing:
+        return {"idempotent": True, "cached_response": existing.response_json}
 
-        data = protheus.post_customers(body.model_dump(), altera=True)
+    data = await protheus.post_customers({"CLIENTES": body.CLIENTES}, altera=altera)
 
+    def _save(db):
         aRetUsr = _safe_first_aretusr(data)
         if aRetUsr:
             a1_cod = str(aRetUsr.get("A1_COD", "")).strip()
             a1_loja = str(aRetUsr.get("A1_LOJA", "")).strip()
             cgc = str(aRetUsr.get("CGC", "")).strip()
-            source_id = str(c.get("A1_CPEDX") or cgc).strip()
+            source_id = _pick(c.get("A1_CPEDX"), cgc) or ""
 
             upsert_mapping_customer(
                 db,
@@ -282,37 +312,30 @@ def update_customer(body: CustomerBody, db: Session = Depends(get_db)):
             )
 
         save_idem(db, idem_key, endpoint, data)
-        return data
 
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e)) from e
-
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=502, detail=str(e)) from e
+    await _db(_save)
+    return data
 
 
-@app.post("/salesorders", dependencies=[Depends(require_api_key)])
-def create_salesorder(body: SalesOrderBody, db: Session = Depends(get_db)):
+async def _create_salesorder_impl(body: SalesOrderBody):
     """
     POST /rest/WSSALESORDERS
     - aplica defaults do documento
     - idempotência por C5_NUMEXT (preferência), C5_BIEPRE, ou C5_CPEDX
     """
-    try:
-        if not body.PEDIDOS:
-            raise ValueError("PEDIDOS vazio.")
+    if not body.PEDIDOS:
+        raise ValueError("PEDIDOS vazio.")
 
-        order_in = body.PEDIDOS[0]
-        order = apply_order_defaults(order_in)
-        idem_key = build_idempotency_key(order)
+    idem_key, order = prepare_order(body.PEDIDOS[0])
 
-        cached = find_idem(db, idem_key)
-        if cached:
-            return {"idempotent": True, "cached_response": cached.response_json}
+    cached = await _db(find_idem, idem_key)
+    if cached:
+        return {"idempotent": True, "cached_response": cached.response_json}
 
-        payload = {"PEDIDOS": [order]}
-        data = protheus.post_salesorders(payload)
+    payload = {"PEDIDOS": [order]}
+    data = await protheus.post_salesorders(payload)
 
+    def _save(db):
         aRetUsr = _safe_first_aretusr(data)
         if aRetUsr:
             c5_cpedx = str(aRetUsr.get("C5_CPEDX", "")).strip()
@@ -326,7 +349,39 @@ def create_salesorder(body: SalesOrderBody, db: Session = Depends(get_db)):
                 )
 
         save_idem_order(db, idem_key, data)
-        return data
+
+    await _db(_save)
+    return data
+
+
+@app.post("/customers", dependencies=[Depends(require_api_key)])
+async def create_customer(body: CustomerBody):
+    try:
+        return await _handle_customer(body, altera=False)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=str(e)) from e
+
+
+@app.put("/customers", dependencies=[Depends(require_api_key)])
+async def update_customer(body: CustomerBody):
+    try:
+        return await _handle_customer(body, altera=True)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=str(e)) from e
+
+
+@app.post("/salesorders", dependencies=[Depends(require_api_key)])
+async def create_salesorder(body: SalesOrderBody):
+    try:
+        return await _create_salesorder_impl(body)
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
@@ -338,7 +393,7 @@ def create_salesorder(body: SalesOrderBody, db: Session = Depends(get_db)):
 # --- Rotas do documento (EXATAS) ----------------------------------------------
 
 @app.get("/rest/WSGETPEDX", dependencies=[Depends(require_api_key)])
-def rest_wsgetpedx(
+async def rest_wsgetpedx(
     cTabela: str = Query(...,
                          description="Nome da tabela (SA1, SA3, SA4, SB1, DA1, SE4, SC5, SF2)"),
     cReset: str | None = Query(None, description="S para resetar cache"),
@@ -346,16 +401,15 @@ def rest_wsgetpedx(
     cValor: str | None = Query(None, description="Valor do filtro"),
     cDtDe: str | None = Query(None, description="Data inicial (yyyymmdd)"),
     cDtAte: str | None = Query(None, description="Data final (yyyymmdd)"),
-    db: Session = Depends(get_db),
 ):
     try:
         table = sync_service.ensure_table(cTabela)
 
-        reset = (cReset or "").strip().upper() == "S"
-        campo = (cCampo or "").strip() or None
-        valor = (cValor or "").strip() or None
-        dt_de = (cDtDe or "").strip() or None
-        dt_ate = (cDtAte or "").strip() or None
+        reset = _flag(cReset)
+        campo = _norm(cCampo)
+        valor = _norm(cValor)
+        dt_de = _norm(cDtDe)
+        dt_ate = _norm(cDtAte)
 
         # valida período se vier completo
         if (dt_de and not dt_ate) or (dt_ate and not dt_de):
@@ -364,7 +418,8 @@ def rest_wsgetpedx(
         if dt_de and dt_ate:
             dt_de, dt_ate = sync_service.validate_period(dt_de, dt_ate)
 
-        data = protheus.get_wsgetpedx(
+        # repassa o corpo cru (tabelas inteiras como SB1 não são decodificadas)
+        raw = await protheus.get_wsgetpedx_raw(
             table,
             reset=reset,
             campo=campo,
@@ -372,11 +427,11 @@ def rest_wsgetpedx(
             dt_de=dt_de,
             dt_ate=dt_ate,
         )
-
-        sync_service.store_raw(
-            db,
+        return await _forward_raw(
             table,
-            {
+            "wsgetpedx",
+            raw,
+            meta={
                 "request": {
                     "cTabela": table,
                     "cReset": cReset,
@@ -385,43 +440,28 @@ def rest_wsgetpedx(
                     "cDtDe": cDtDe,
                     "cDtAte": cDtAte,
                 },
-                "response": data,
             },
+            details={"cReset": reset, "cCampo": campo, "cValor": valor,
+                     "cDtDe": dt_de, "cDtAte": dt_ate},
         )
-        sync_service.log_run(
-            db,
-            table,
-            "wsgetpedx",
-            "success",
-            {"cReset": reset, "cCampo": campo, "cValor": valor,
-                "cDtDe": dt_de, "cDtAte": dt_ate},
-        )
-
-        return data
 
     except ValueError as e:
-        sync_service.log_run(db, (cTabela or "").upper(),
-                             "wsgetpedx", "error", {"error": str(e)})
+        await _log_error((cTabela or "").upper(), "wsgetpedx", e)
         raise HTTPException(status_code=400, detail=str(e)) from e
 
     except httpx.HTTPError as e:
-        sync_service.log_run(db, (cTabela or "").upper(),
-                             "wsgetpedx", "error", {"error": str(e)})
+        await _log_error((cTabela or "").upper(), "wsgetpedx", e)
         raise HTTPException(status_code=502, detail=str(e)) from e
 
 
 @app.post("/rest/WSCUSTOMERS", dependencies=[Depends(require_api_key)])
-def rest_wscustomers(
+async def rest_wscustomers(
     body: CustomerBody,
     cAltera: str | None = Query(
         None, description="Quando cAltera=S, altera cliente existente"),
-    db: Session = Depends(get_db),
 ):
     try:
-        altera = (cAltera or "").strip().upper() == "S"
-        if altera:
-            return update_customer(body, db)  # type: ignore[arg-type]
-        return create_customer(body, db)  # type: ignore[arg-type]
+        return await _handle_customer(body, altera=_flag(cAltera))
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
@@ -431,9 +471,9 @@ def rest_wscustomers(
 
 
 @app.post("/rest/WSSALESORDERS", dependencies=[Depends(require_api_key)])
-def rest_wssalesorders(body: SalesOrderBody, db: Session = Depends(get_db)):
+async def rest_wssalesorders(body: SalesOrderBody):
     try:
-        return create_salesorder(body, db)  # type: ignore[arg-type]
+        return await _create_salesorder_impl(body)
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
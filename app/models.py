@@ -1,9 +1,13 @@
-from sqlalchemy import String, DateTime, Integer, UniqueConstraint, text
+from sqlalchemy import String, DateTime, Integer, LargeBinary, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.types import JSON
 
 from .db import Base
 
+# JSON em qualquer banco; JSONB no PostgreSQL (merge com || no próprio banco)
+JSONDoc = JSON().with_variant(JSONB(), "postgresql")
+
 
 class SyncRun(Base):
     __tablename__ = "sync_runs"
@@ -24,7 +28,7 @@ class ExternalMapping(Base):
     """
     Guarda vínculo entre IDs do sistema de origem (source_id) e IDs do Protheus.
 
-    - customer: source_id (A1_CPEDX ou A1_CGC) -> (A1_COD, A1_LOJA)
+    - customer: source_id (A1_CPEDX ou A1_CGC) -> (A1_COD, A1_LOJA), cgc
     - order:    source_id (C5_CPEDX)          -> (C5_NUM)
     """
     __tablename__ = "external_mappings"
@@ -35,7 +39,8 @@ class ExternalMapping(Base):
     source_id: Mapped[str] = mapped_column(String(60), index=True)
     protheus_code: Mapped[str] = mapped_column(String(60), default="")
     protheus_store: Mapped[str] = mapped_column(String(10), default="")
-    extra: Mapped[dict] = mapped_column(JSON, default=dict)
+    cgc: Mapped[str] = mapped_column(String(20), index=True, default="")  # só customer
+    extra: Mapped[dict] = mapped_column(JSONDoc, default=dict)
 
     created_at: Mapped[object] = mapped_column(
         DateTime(timezone=True),
@@ -46,13 +51,16 @@ class ExternalMapping(Base):
 class IdempotencyKey(Base):
     """
     Evita duplicar POST/PUT (principalmente pedido e cliente).
+
+    A busca é sempre por (key, endpoint): o índice único de uq_key_endpoint
+    atende a consulta sozinho, sem índices avulsos por coluna.
     """
     __tablename__ = "idempotency_keys"
     __table_args__ = (UniqueConstraint("key", "endpoint", name="uq_key_endpoint"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    key: Mapped[str] = mapped_column(String(120), index=True)
-    endpoint: Mapped[str] = mapped_column(String(80), index=True)
+    key: Mapped[str] = mapped_column(String(120))
+    endpoint: Mapped[str] = mapped_column(String(80))
     response_json: Mapped[dict] = mapped_column(JSON, default=dict)
 
     created_at: Mapped[object] = mapped_column(
@@ -64,6 +72,9 @@ class IdempotencyKey(Base):
 class RawStore(Base):
     """
     Guarda payload cru do Protheus (auditoria/debug).
+
+    JSON (não JSONB) de propósito: o texto fica como recebido, sem reordenar
+    nem deduplicar chaves.
     """
     __tablename__ = "raw_store"
 
@@ -75,3 +86,21 @@ class RawStore(Base):
         DateTime(timezone=True),
         server_default=text("CURRENT_TIMESTAMP"),
     )
+
+
+class RawBlob(Base):
+    """
+    Payload cru do Protheus comprimido (dumps grandes de período: SC5/SF2).
+    """
+    __tablename__ = "raw_blobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    table_name: Mapped[str] = mapped_column(String(10), index=True)
+    meta: Mapped[dict] = mapped_column(JSON, default=dict)
+    encoding: Mapped[str] = mapped_column(String(10))  # zlib
+    content: Mapped[bytes] = mapped_column(LargeBinary)
+
+    created_at: Mapped[object] = mapped_column(
+        DateTime(timezone=True),
+        server_default=text("CURRENT_TIMESTAMP"),
+    )
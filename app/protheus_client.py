@@ -1,7 +1,41 @@
+import json
+import re
 from dataclasses import dataclass
 from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from urllib.request import getproxies, proxy_bypass
 
 import httpx
+import orjson
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# início de um documento JSON (objeto/lista), sem copiar o corpo
+_JSON_START = re.compile(rb"\s*[\[{]")
+
+
+def _dumps(payload: dict) -> bytes:
+    try:
+        return orjson.dumps(payload)
+    except orjson.JSONEncodeError:
+        # orjson recusa inteiros fora de 64 bits, que o corpo da requisição
+        # (json da stdlib) aceita: volta para a stdlib nesse caso raro
+        return json.dumps(payload, ensure_ascii=False).encode()
+
+
+def _resolve_proxy(base_url: str, proxy: Optional[str]) -> Optional[str]:
+    """
+    Proxy explícito (PROTHEUS_PROXY) ou, na falta dele, o do ambiente
+    (HTTP(S)_PROXY / ALL_PROXY, respeitando NO_PROXY) para o host do Protheus.
+    Com transport explícito o httpx não lê essas variáveis sozinho.
+    """
+    if proxy:
+        return proxy
+    parts = urlsplit(base_url)
+    if not parts.hostname or proxy_bypass(parts.hostname):
+        return None
+    env = getproxies()
+    return env.get(parts.scheme) or env.get("all")
 
 
 @dataclass(frozen=True)
@@ -10,6 +44,12 @@ class ProtheusConfig:
     username: str
     password: str
     timeout_s: float = 30.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_s: float = 60.0
+    http2: bool = False
+    connect_retries: int = 2
+    proxy: Optional[str] = None
 
 
 class ProtheusClient:
@@ -18,16 +58,57 @@ class ProtheusClient:
     - GET  /rest/WSGETPEDX
     - POST /rest/WSCUSTOMERS
     - POST /rest/WSSALESORDERS
+
+    Uma única instância por processo: o pool do httpx mantém as conexões
+    abertas (keep-alive) entre chamadas, evitando novo handshake TCP/TLS.
+    O httpx.AsyncClient é criado em open() (startup da app) e descartado em
+    aclose() (shutdown); um novo ciclo de vida da app abre outro.
+
+    O transporte repete só a abertura da conexão (ConnectError/ConnectTimeout),
+    então é seguro também para POST: nada foi enviado ao Protheus.
+    (Via proxy o httpx 0.27 não aplica esses retries.)
     """
 
     def __init__(self, cfg: ProtheusConfig) -> None:
-        self._client = httpx.Client(
+        self._cfg = cfg
+        self._client: httpx.AsyncClient | None = None
+
+    def open(self) -> None:
+        if self._client is None:
+            self._client = self._build_client(self._cfg)
+
+    @staticmethod
+    def _build_client(cfg: ProtheusConfig) -> httpx.AsyncClient:
+        # com transport explícito, http2/limits/proxy precisam ir nele (o client os ignora)
+        transport = httpx.AsyncHTTPTransport(
+            http2=cfg.http2,
+            retries=cfg.connect_retries,
+            proxy=_resolve_proxy(cfg.base_url, cfg.proxy),
+            limits=httpx.Limits(
+                max_connections=cfg.max_connections,
+                max_keepalive_connections=cfg.max_keepalive_connections,
+                keepalive_expiry=cfg.keepalive_expiry_s,
+            ),
+        )
+        return httpx.AsyncClient(
             base_url=cfg.base_url.rstrip("/"),
             auth=(cfg.username, cfg.password),
             timeout=cfg.timeout_s,
+            transport=transport,
         )
 
-    def get_wsgetpedx(
+    @property
+    def _http(self) -> httpx.AsyncClient:
+        # fora do lifespan (scripts, testes sem startup) abre sob demanda
+        self.open()
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    async def get_wsgetpedx(
         self,
         tabela: str,
         *,
@@ -37,6 +118,24 @@ class ProtheusClient:
         dt_de: Optional[str] = None,
         dt_ate: Optional[str] = None,
     ) -> Any:
+        raw = await self.get_wsgetpedx_raw(
+            tabela, reset=reset, campo=campo, valor=valor, dt_de=dt_de, dt_ate=dt_ate)
+        return orjson.loads(raw)
+
+    async def get_wsgetpedx_raw(
+        self,
+        tabela: str,
+        *,
+        reset: bool = False,
+        campo: Optional[str] = None,
+        valor: Optional[str] = None,
+        dt_de: Optional[str] = None,
+        dt_ate: Optional[str] = None,
+    ) -> bytes:
+        """
+        Corpo JSON do WSGETPEDX sem decodificar (para repassar/armazenar
+        dumps grandes sem montar a árvore de objetos Python).
+        """
         params: Dict[str, str] = {"cTabela": tabela}
 
         if reset:
@@ -50,17 +149,29 @@ class ProtheusClient:
             params["cDtDe"] = dt_de
             params["cDtAte"] = dt_ate
 
-        r = self._client.get("/rest/WSGETPEDX", params=params)
+        r = await self._http.get("/rest/WSGETPEDX", params=params)
         r.raise_for_status()
-        return r.json()
 
-    def post_customers(self, payload: dict, *, altera: bool = False) -> Any:
+        # o corpo é repassado sem decodificar: barra aqui HTML/texto de erro
+        # que o Protheus às vezes devolve com status 200
+        if not _JSON_START.match(r.content):
+            raise ValueError(
+                f"Resposta do WSGETPEDX não é JSON (Content-Type: {r.headers.get('content-type', '-')}).")
+        return r.content
+
+    async def post_customers(self, payload: dict, *, altera: bool = False) -> Any:
         params = {"cAltera": "S"} if altera else None
-        r = self._client.post("/rest/WSCUSTOMERS", params=params, json=payload)
-        r.raise_for_status()
-        return r.json()
+        return await self._post_json("/rest/WSCUSTOMERS", payload, params=params)
+
+    async def post_salesorders(self, payload: dict) -> Any:
+        return await self._post_json("/rest/WSSALESORDERS", payload)
 
-    def post_salesorders(self, payload: dict) -> Any:
-        r = self._client.post("/rest/WSSALESORDERS", json=payload)
+    async def _post_json(self, url: str, payload: dict, *, params: Optional[dict] = None) -> Any:
+        r = await self._http.post(
+            url,
+            params=params,
+            content=_dumps(payload),
+            headers=_JSON_HEADERS,
+        )
         r.raise_for_status()
-        return r.json()
+        return orjson.loads(r.content)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Any, List, Dict
+from typing import List
 
 
 class PullRequest(BaseModel):
@@ -19,9 +19,11 @@ class PeriodRequest(BaseModel):
     dtAte: str
 
 
+# Itens como `dict` simples: o JSON já garante chaves str, então não vale
+# validar chave/valor um a um (lotes grandes de sync).
 class CustomerBody(BaseModel):
-    CLIENTES: List[Dict[str, Any]]
+    CLIENTES: List[dict]
 
 
 class SalesOrderBody(BaseModel):
-    PEDIDOS: List[Dict[str, Any]]
+    PEDIDOS: List[dict]
@@ -1,22 +1,36 @@
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
 
-from ..models import ExternalMapping, IdempotencyKey
+from ..models import IdempotencyKey
+from .idem_cache import IdemEntry, idem_cache
+from .mapping_service import upsert_mapping
 
 
-def get_idem(db: Session, key: str, endpoint: str) -> IdempotencyKey | None:
-    stmt = select(IdempotencyKey).where(
+def get_idem(db: Session, key: str, endpoint: str) -> IdemEntry | None:
+    cached = idem_cache.get(key, endpoint)
+    if cached:
+        return cached
+
+    # só a resposta interessa: Core select, sem montar objeto ORM;
+    # lambda_stmt monta o statement uma vez e reaproveita (key/endpoint viram bind)
+    stmt = lambda_stmt(lambda: select(IdempotencyKey.response_json).where(
         IdempotencyKey.key == key,
         IdempotencyKey.endpoint == endpoint,
-    )
-    return db.execute(stmt).scalar_one_or_none()
+    ))
+    row = db.execute(stmt).first()
+    if row is None:
+        return None
+    return idem_cache.put(IdemEntry(key, endpoint, row.response_json))
 
 
 def save_idem(db: Session, key: str, endpoint: str, response_json: dict) -> IdempotencyKey:
     idem = IdempotencyKey(key=key, endpoint=endpoint,
                           response_json=response_json)
     db.add(idem)
-    db.commit()
+    # flush (não commit): conflito de chave aparece aqui; o commit fica com a
+    # rota, junto com o mapeamento, e só depois dele a chave entra no cache
+    db.flush()
+    idem_cache.put_after_commit(db, IdemEntry(key, endpoint, response_json))
     return idem
 
 
@@ -27,29 +41,13 @@ def upsert_mapping_customer(
     a1_loja: str,
     cgc: str,
     extra: dict | None = None,
-) -> ExternalMapping:
-    stmt = select(ExternalMapping).where(
-        ExternalMapping.entity_type == "customer",
-        ExternalMapping.source_id == source_id,
+) -> None:
+    upsert_mapping(
+        db,
+        "customer",
+        source_id,
+        protheus_code=a1_cod,
+        protheus_store=a1_loja or "",
+        cgc=cgc or "",
+        extra=extra or {},
     )
-    m = db.execute(stmt).scalar_one_or_none()
-
-    new_extra = {**(m.extra or {}), **(extra or {}),
-                 "CGC": cgc} if m else {**(extra or {}), "CGC": cgc}
-
-    if m:
-        m.protheus_code = a1_cod or m.protheus_code
-        m.protheus_store = a1_loja or m.protheus_store
-        m.extra = new_extra
-    else:
-        m = ExternalMapping(
-            entity_type="customer",
-            source_id=source_id,
-            protheus_code=a1_cod or "",
-            protheus_store=a1_loja or "",
-            extra=new_extra,
-        )
-        db.add(m)
-
-    db.commit()
-    return m
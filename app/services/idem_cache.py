@@ -0,0 +1,66 @@
+from threading import RLock
+from typing import Any, NamedTuple
+
+from cachetools import TTLCache
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..settings import settings
+
+# entradas aguardando o commit da sessão (Session.info)
+_PENDING = "idem_cache_pending"
+
+
+class IdemEntry(NamedTuple):
+    key: str
+    endpoint: str
+    response_json: Any
+
+
+class IdemCache:
+    """
+    Cache em memória (LRU + TTL) das chaves de idempotência já gravadas.
+
+    Só guarda acertos: uma chave gravada nunca muda, então o cache não fica
+    inconsistente; uma ausência sempre volta a consultar o banco.
+    maxsize=0 desliga o cache (toda consulta vai ao banco).
+    """
+
+    def __init__(self, maxsize: int, ttl_s: float) -> None:
+        self._cache: TTLCache | None = TTLCache(maxsize=maxsize, ttl=ttl_s) if maxsize > 0 else None
+        self._lock = RLock()
+
+    def get(self, key: str, endpoint: str) -> IdemEntry | None:
+        if self._cache is None:
+            return None
+        with self._lock:
+            return self._cache.get((endpoint, key))
+
+    def put(self, entry: IdemEntry) -> IdemEntry:
+        if self._cache is not None:
+            with self._lock:
+                self._cache[(entry.endpoint, entry.key)] = entry
+        return entry
+
+    def put_after_commit(self, db: Session, entry: IdemEntry) -> IdemEntry:
+        """
+        Agenda o put para depois do commit de `db`. Se a transação falhar ou
+        sofrer rollback, a entrada é descartada: o cache nunca afirma uma
+        chave que não está no banco.
+        """
+        db.info.setdefault(_PENDING, []).append((self, entry))
+        return entry
+
+
+@event.listens_for(Session, "after_commit")
+def _put_pending(session: Session) -> None:
+    for cache, entry in session.info.pop(_PENDING, ()):
+        cache.put(entry)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+idem_cache = IdemCache(settings.IDEM_CACHE_MAXSIZE, settings.IDEM_CACHE_TTL_S)
@@ -0,0 +1,54 @@
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+
+from ..db import dialect_insert, json_merge
+from ..models import ExternalMapping
+
+
+def upsert_mapping(
+    db: Session,
+    entity_type: str,
+    source_id: str,
+    protheus_code: str,
+    extra: dict,
+    protheus_store: str | None = None,
+    cgc: str | None = None,
+) -> None:
+    """
+    INSERT ... ON CONFLICT (entity_type, source_id) DO UPDATE num único comando.
+
+    No conflito, códigos vazios não sobrescrevem os já gravados e `extra`
+    é mesclado com o existente. Não faz commit: fica a cargo de quem chama.
+    """
+    values = {
+        "entity_type": entity_type,
+        "source_id": source_id,
+        "protheus_code": protheus_code or "",
+        "extra": extra,
+    }
+    if protheus_store is not None:
+        values["protheus_store"] = protheus_store
+    if cgc is not None:
+        values["cgc"] = cgc
+
+    stmt = dialect_insert(db, ExternalMapping).values(**values)
+    excluded = stmt.excluded
+
+    set_ = {
+        "protheus_code": _new_or_current(excluded.protheus_code, ExternalMapping.protheus_code),
+        "extra": json_merge(db, ExternalMapping.extra, extra),
+    }
+    if protheus_store is not None:
+        set_["protheus_store"] = _new_or_current(
+            excluded.protheus_store, ExternalMapping.protheus_store)
+    if cgc is not None:
+        set_["cgc"] = _new_or_current(excluded.cgc, ExternalMapping.cgc)
+
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["entity_type", "source_id"],
+        set_=set_,
+    ))
+
+
+def _new_or_current(new, current):
+    return case((new != "", new), else_=current)
@@ -1,69 +1,61 @@
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
 
-from ..models import IdempotencyKey, ExternalMapping
+from ..models import IdempotencyKey
+from .idem_cache import IdemEntry, idem_cache
+from .mapping_service import upsert_mapping
 
 ORDER_ENDPOINT = "POST:/salesorders"
 
 
-def find_idem(db: Session, key: str) -> IdempotencyKey | None:
-    stmt = select(IdempotencyKey).where(
+def find_idem(db: Session, key: str) -> IdemEntry | None:
+    cached = idem_cache.get(key, ORDER_ENDPOINT)
+    if cached:
+        return cached
+
+    # só a resposta interessa: Core select, sem montar objeto ORM;
+    # lambda_stmt monta o statement uma vez e reaproveita (key vira bind)
+    stmt = lambda_stmt(lambda: select(IdempotencyKey.response_json).where(
         IdempotencyKey.key == key,
         IdempotencyKey.endpoint == ORDER_ENDPOINT,
-    )
-    return db.execute(stmt).scalar_one_or_none()
+    ))
+    row = db.execute(stmt).first()
+    if row is None:
+        return None
+    return idem_cache.put(IdemEntry(key, ORDER_ENDPOINT, row.response_json))
 
 
 def save_idem(db: Session, key: str, response_json: dict) -> IdempotencyKey:
     idem = IdempotencyKey(key=key, endpoint=ORDER_ENDPOINT,
                           response_json=response_json)
     db.add(idem)
-    db.commit()
+    db.flush()
+    idem_cache.put_after_commit(db, IdemEntry(key, ORDER_ENDPOINT, response_json))
     return idem
 
 
-def upsert_mapping_order(db: Session, source_id: str, c5_num: str, extra: dict | None = None) -> ExternalMapping:
-    stmt = select(ExternalMapping).where(
-        ExternalMapping.entity_type == "order",
-        ExternalMapping.source_id == source_id,
-    )
-    m = db.execute(stmt).scalar_one_or_none()
-
-    new_extra = {**(m.extra or {}), **(extra or {})} if m else (extra or {})
-
-    if m:
-        m.protheus_code = c5_num or m.protheus_code
-        m.extra = new_extra
-    else:
-        m = ExternalMapping(
-            entity_type="order",
-            source_id=source_id,
-            protheus_code=c5_num or "",
-            extra=new_extra,
-        )
-        db.add(m)
-
-    db.commit()
-    return m
+def upsert_mapping_order(db: Session, source_id: str, c5_num: str, extra: dict | None = None) -> None:
+    upsert_mapping(db, "order", source_id, protheus_code=c5_num, extra=extra or {})
 
 
 def apply_order_defaults(order: dict) -> dict:
-   
-    o = dict(order)
+    """
+    Preenche os defaults do pedido NO PRÓPRIO dict (e nos itens) e o devolve.
+    O pedido vem do corpo da requisição, já é uma cópia exclusiva: não há
+    por que duplicar cabeçalho e itens.
+    """
+    order.setdefault("C5_BIEFPGA", "BOL")
+    order.setdefault("C5_TIPO", "N")
+    order.setdefault("C5_NATUREZ", "2001")
 
-    o.setdefault("C5_BIEFPGA", "BOL")
-    o.setdefault("C5_TIPO", "N")
-    o.setdefault("C5_NATUREZ", "2001")
+    itens = order.get("ITENS")
+    if isinstance(itens, list):
+        for it in itens:
+            if not isinstance(it, dict):
+                raise ValueError("Item de ITENS inválido (esperado objeto).")
+            it.setdefault("C6_LOCAL", "13")
 
-    if isinstance(o.get("ITENS"), list):
-        itens = []
-        for it in o["ITENS"]:
-            it2 = dict(it)
-            it2.setdefault("C6_LOCAL", "13")
-            itens.append(it2)
-        o["ITENS"] = itens
-
-    return o
+    return order
 
 
 def build_idempotency_key(order: dict) -> str:
@@ -74,3 +66,12 @@ def build_idempotency_key(order: dict) -> str:
             return v
     raise ValueError(
         "Pedido sem chave de idempotência (faltou C5_NUMEXT/C5_BIEPRE/C5_CPEDX).")
+
+
+def prepare_order(order: dict) -> tuple[str, dict]:
+    """
+    Preparo do pedido antes do envio: chave de idempotência + defaults.
+    A chave vem primeiro: pedido sem chave falha antes de qualquer alteração.
+    """
+    key = build_idempotency_key(order)
+    return key, apply_order_defaults(order)
@@ -1,14 +1,21 @@
+import zlib
+from functools import lru_cache
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
-from ..models import SyncRun, RawStore
+from ..models import RawBlob, SyncRun, RawStore
 from ..utils import yyyymmdd_or_raise
 
 
 # Tabelas citadas no documento (inclui SA2 pois aparece no reset de fornecedores)
-ALLOWED_TABLES = {"SA1", "SA2", "SA3",
-                  "SA4", "SB1", "DA1", "SE4", "SC5", "SF2"}
+ALLOWED_TABLES = frozenset({"SA1", "SA2", "SA3",
+                            "SA4", "SB1", "DA1", "SE4", "SC5", "SF2"})
 
 
+# Poucas grafias distintas chegam na prática ("SA1", "sa1"...): memoiza a
+# normalização. Entradas inválidas levantam erro e não entram no cache.
+@lru_cache(maxsize=32)
 def ensure_table(table: str) -> str:
     t = (table or "").strip().upper()
     if t not in ALLOWED_TABLES:
@@ -16,17 +23,33 @@ def ensure_table(table: str) -> str:
     return t
 
 
+# log_run/store_raw não fazem commit: a rota grava tudo numa transação só.
+# São linhas só de escrita: INSERT direto (Core), sem objeto ORM na sessão.
+
 def log_run(db: Session, table_name: str, mode: str, status: str, details: dict):
-    run = SyncRun(table_name=table_name, mode=mode,
-                  status=status, details=details)
-    db.add(run)
-    db.commit()
-    return run.id
+    stmt = insert(SyncRun).values(
+        table_name=table_name, mode=mode, status=status, details=details,
+    ).returning(SyncRun.id)
+    return db.execute(stmt).scalar_one()
+
+
+def summarize(data) -> dict:
+    """Resumo do retorno para o log (o payload completo fica só no raw_store)."""
+    return {"rows": len(data) if isinstance(data, list) else None}
 
 
 def store_raw(db: Session, table_name: str, payload: dict):
-    db.add(RawStore(table_name=table_name, payload=payload))
-    db.commit()
+    db.execute(insert(RawStore).values(table_name=table_name, payload=payload))
+
+
+def compress_raw(content: bytes) -> bytes:
+    return zlib.compress(content, 6)
+
+
+def store_raw_blob(db: Session, table_name: str, meta: dict, compressed: bytes):
+    """Guarda um payload já comprimido com compress_raw (zlib)."""
+    db.execute(insert(RawBlob).values(
+        table_name=table_name, meta=meta, encoding="zlib", content=compressed))
 
 
 def validate_period(dt_de: str, dt_ate: str):
@@ -8,10 +8,28 @@ class Settings(BaseSettings):
     APP_API_KEY: str
 
     DATABASE_URL: str = "sqlite:///./app.db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE_S: int = 1800
+
+    # grava o payload cru do Protheus (raw_store/raw_blobs) para auditoria/debug
+    STORE_RAW: bool = False
+
+    IDEM_CACHE_MAXSIZE: int = 10_000
+    IDEM_CACHE_TTL_S: float = 300.0
 
     PROTHEUS_BASE_URL: str
     PROTHEUS_USERNAME: str
     PROTHEUS_PASSWORD: str
     PROTHEUS_TIMEOUT_S: float = 30.0
+    PROTHEUS_MAX_CONNECTIONS: int = 100
+    PROTHEUS_MAX_KEEPALIVE: int = 20
+    PROTHEUS_KEEPALIVE_EXPIRY_S: float = 60.0
+    # HTTP/2 só é negociado em HTTPS (ALPN); em http:// segue HTTP/1.1
+    PROTHEUS_HTTP2: bool = False
+    # novas tentativas só em falha de conexão (requisição não chegou ao Protheus)
+    PROTHEUS_CONNECT_RETRIES: int = 2
+    # vazio: usa HTTP(S)_PROXY/NO_PROXY do ambiente
+    PROTHEUS_PROXY: str | None = None
 
 settings = Settings()